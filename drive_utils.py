@@ -8,7 +8,11 @@ import io
 import time
 import re
 import hashlib
-from typing import List, Optional, Dict
+import shutil
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Dict
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -25,6 +29,49 @@ TOKEN_PATH: str = 'credentials/token.json'
 DOWNLOAD_RETRIES: int = 3
 DOWNLOAD_DELAY_SECONDS: int = 5
 
+# --- Streaming Write Configuration ---
+DOWNLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024
+WRITE_BUFFER_SIZE: int = 1024 * 1024
+PARTIAL_FILE_SUFFIX: str = '.part'
+FSYNC_MODES: List[str] = ['arquivo', 'lote', 'final']
+FREE_SPACE_MARGIN_BYTES: int = 1024 * 1024 * 1024
+
+# --- Shared Quota Configuration ---
+API_REQUESTS_PER_SECOND: float = 8.0
+API_BURST_SIZE: int = 16
+
+
+class RateLimiter:
+    """Orçamento global de pedidos à API (token bucket), partilhado entre threads."""
+
+    def __init__(self, rate: float = API_REQUESTS_PER_SECOND, burst: int = API_BURST_SIZE) -> None:
+        if rate <= 0:
+            raise ValueError("A taxa de pedidos por segundo deve ser positiva.")
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloqueia até existir uma ficha disponível no orçamento e consome-a."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+def _throttle(rate_limiter: Optional[RateLimiter]) -> None:
+    """Consome uma ficha do orçamento global, se houver um limitador configurado."""
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+
 
 def _sanitize_path_component(name: str) -> str:
     """Executa uma limpeza pesada em nomes de ficheiros/pastas para o sistema de ficheiros."""
@@ -46,8 +93,8 @@ def _sanitize_path_component(name: str) -> str:
         return safe_name[:max_len]
 
 
-def setup_google_drive_service() -> Optional[Resource]:
-    """Estabelece e retorna um cliente de serviço autenticado para a API do Drive."""
+def load_credentials() -> Credentials:
+    """Carrega, atualiza ou obtém (via fluxo OAuth) as credenciais do utilizador."""
     creds = None
     if os.path.exists(TOKEN_PATH):
         creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
@@ -63,6 +110,13 @@ def setup_google_drive_service() -> Optional[Resource]:
             creds = flow.run_local_server(port=0)
         with open(TOKEN_PATH, 'w') as token:
             token.write(creds.to_json())
+    return creds
+
+
+def setup_google_drive_service(creds: Optional[Credentials] = None) -> Optional[Resource]:
+    """Estabelece e retorna um cliente de serviço autenticado para a API do Drive."""
+    if creds is None:
+        creds = load_credentials()
     try:
         service = build('drive', 'v3', credentials=creds)
         logging.info('Cliente de serviço do Google Drive inicializado com sucesso.')
@@ -72,22 +126,203 @@ def setup_google_drive_service() -> Optional[Resource]:
         return None
 
 
+class DriveServicePool:
+    """Conjunto limitado de clientes do Drive partilhando as mesmas credenciais.
+
+    Os clientes da API não são seguros entre threads; cada worker requisita um
+    cliente exclusivo e devolve-o ao terminar a transferência.
+    """
+
+    def __init__(self, size: int, creds: Optional[Credentials] = None) -> None:
+        if size < 1:
+            raise ValueError("O pool de clientes do Drive deve ter pelo menos um cliente.")
+        self.size = size
+        self._creds = creds if creds is not None else load_credentials()
+        self._idle: "queue.Queue[Resource]" = queue.Queue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        # Cria o primeiro cliente já aqui, para que falhas de conexão apareçam antes do trabalho.
+        self._idle.put(self._try_create())
+
+    def _try_create(self) -> Optional[Resource]:
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            service = setup_google_drive_service(self._creds)
+            if service is None:
+                raise RuntimeError("Não foi possível criar um cliente do Google Drive para o pool.")
+            self._created += 1
+            return service
+
+    @contextmanager
+    def acquire(self) -> Iterator[Resource]:
+        """Empresta um cliente do pool, criando-o sob demanda até ao limite."""
+        try:
+            service = self._idle.get_nowait()
+        except queue.Empty:
+            service = self._try_create() or self._idle.get()
+        try:
+            yield service
+        finally:
+            self._idle.put(service)
+
+
+class FsyncPolicy:
+    """Define quando os ficheiros baixados são sincronizados com o disco.
+
+    - 'arquivo': fsync de cada ficheiro antes de o tornar visível.
+    - 'lote': fsync em grupos de `every_n` ficheiros concluídos.
+    - 'final': fsync de todos os ficheiros pendentes apenas em `flush()`.
+    """
+
+    def __init__(self, mode: str = 'final', every_n: int = 100) -> None:
+        if mode not in FSYNC_MODES:
+            raise ValueError(f"Política de fsync desconhecida: '{mode}'.")
+        self.mode = mode
+        self.every_n = max(1, every_n)
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+
+    def sync_open_file(self, fh: io.BufferedWriter) -> None:
+        """Chamado com o ficheiro ainda aberto, após a escrita do último bloco."""
+        if self.mode == 'arquivo':
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def register(self, filepath: str) -> None:
+        """Chamado quando o ficheiro final fica disponível no destino."""
+        if self.mode == 'arquivo':
+            return
+        with self._lock:
+            self._pending.append(filepath)
+            if self.mode != 'lote' or len(self._pending) < self.every_n:
+                return
+            batch, self._pending = self._pending, []
+        _fsync_paths(batch)
+
+    def flush(self) -> None:
+        """Sincroniza todos os ficheiros ainda não sincronizados."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        _fsync_paths(batch)
+
+
+class WriteSettings:
+    """Parâmetros de escrita em streaming partilhados pelos downloads."""
+
+    def __init__(self, chunk_size: int = DOWNLOAD_CHUNK_SIZE, buffer_size: int = WRITE_BUFFER_SIZE,
+                 preallocate: bool = True, fsync_policy: Optional[FsyncPolicy] = None) -> None:
+        self.chunk_size = chunk_size
+        self.buffer_size = buffer_size
+        self.preallocate = preallocate
+        self.fsync_policy = fsync_policy or FsyncPolicy()
+
+
+def _fsync_paths(filepaths: List[str]) -> None:
+    """Executa fsync numa lista de ficheiros já fechados."""
+    for filepath in filepaths:
+        try:
+            # No Windows, os.fsync (FlushFileBuffers) exige um handle com acesso de escrita.
+            fd = os.open(filepath, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logging.warning(f"Falha ao sincronizar '{filepath}' com o disco: {e}")
+
+
+def _to_os_path(filepath: str) -> str:
+    """Converte para caminho absoluto, com o prefixo de caminhos longos apenas no Windows."""
+    abs_filepath = os.path.abspath(filepath)
+    if os.name == 'nt' and not abs_filepath.startswith('\\\\?\\'):
+        return f"\\\\?\\{abs_filepath}"
+    return abs_filepath
+
+
+def partial_path_for(filepath: str) -> str:
+    """Caminho do ficheiro temporário (.part) usado enquanto `filepath` é transferido."""
+    return _to_os_path(filepath) + PARTIAL_FILE_SUFFIX
+
+
+def _preallocate(fh: io.BufferedWriter, size: int) -> None:
+    """Reserva espaço em disco para o ficheiro quando o tamanho é conhecido."""
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fh.fileno(), 0, size)
+        else:
+            fh.truncate(size)
+    except OSError as e:
+        logging.debug(f"Pré-alocação de {size} bytes não suportada: {e}")
+
+
+def _stream_to_file(request, filepath: str, label: str, expected_size: Optional[int],
+                    settings: WriteSettings, rate_limiter: Optional[RateLimiter],
+                    progress_callback: Optional[Callable[[int], None]] = None) -> None:
+    """Transfere o conteúdo em blocos limitados para um ficheiro .part e promove-o no fim.
+
+    `progress_callback`, se indicado, recebe o número de bytes de cada bloco recebido
+    e, se a tentativa falhar, um valor negativo que desconta os bytes já reportados.
+    """
+    reported_bytes = 0
+    os_filepath = _to_os_path(filepath)
+    partial_filepath = partial_path_for(filepath)
+    try:
+        with open(partial_filepath, "wb", buffering=settings.buffer_size) as fh:
+            if settings.preallocate and expected_size:
+                _preallocate(fh, expected_size)
+            downloader = MediaIoBaseDownload(fh, request, chunksize=settings.chunk_size)
+            done = False
+            while not done:
+                _throttle(rate_limiter)
+                position = fh.tell()
+                status, done = downloader.next_chunk()
+                if progress_callback is not None:
+                    progress_callback(fh.tell() - position)
+                    reported_bytes += fh.tell() - position
+                logging.info(f"{label}: {int(status.progress() * 100)}% concluído.")
+            fh.truncate(fh.tell())
+            settings.fsync_policy.sync_open_file(fh)
+        os.replace(partial_filepath, os_filepath)
+        settings.fsync_policy.register(os_filepath)
+    except BaseException:
+        if os.path.exists(partial_filepath):
+            os.remove(partial_filepath)
+        if progress_callback is not None and reported_bytes:
+            progress_callback(-reported_bytes)
+        raise
+
+
+def check_free_disk_space(target_dir: str, required_bytes: int, margin: int = FREE_SPACE_MARGIN_BYTES) -> bool:
+    """Verifica se o disco de destino tem espaço para os bytes planeados mais uma margem."""
+    probe_dir = os.path.abspath(target_dir)
+    while not os.path.isdir(probe_dir) and os.path.dirname(probe_dir) != probe_dir:
+        probe_dir = os.path.dirname(probe_dir)
+    free_bytes = shutil.disk_usage(probe_dir).free
+    needed_bytes = required_bytes + margin
+    if free_bytes < needed_bytes:
+        logging.critical(f"Espaço em disco insuficiente em '{probe_dir}': "
+                         f"{free_bytes / 1024 ** 3:.2f} GB livres, {needed_bytes / 1024 ** 3:.2f} GB necessários.")
+        return False
+    logging.info(f"Espaço em disco verificado: {free_bytes / 1024 ** 3:.2f} GB livres, "
+                 f"{needed_bytes / 1024 ** 3:.2f} GB necessários.")
+    return True
+
+
 def download_file(service: Resource, file_id: str, safe_file_name: str, download_folder: str, 
-                  retries: int = DOWNLOAD_RETRIES, delay: int = DOWNLOAD_DELAY_SECONDS) -> Dict:
-    """Baixa um ficheiro binário, com retentativas e suporte a caminhos longos."""
+                  retries: int = DOWNLOAD_RETRIES, delay: int = DOWNLOAD_DELAY_SECONDS,
+                  rate_limiter: Optional[RateLimiter] = None, expected_size: Optional[int] = None,
+                  write_settings: Optional[WriteSettings] = None,
+                  progress_callback: Optional[Callable[[int], None]] = None) -> Dict:
+    """Baixa um ficheiro binário em streaming, com retentativas e suporte a caminhos longos."""
+    settings = write_settings or WriteSettings()
     for attempt in range(retries):
         try:
             request = service.files().get_media(fileId=file_id)
             os.makedirs(download_folder, exist_ok=True)
             filepath = os.path.join(download_folder, safe_file_name)
-            abs_filepath = os.path.abspath(filepath)
-            long_path_aware_filepath = f"\\\\?\\{abs_filepath}"
-            with open(long_path_aware_filepath, "wb") as fh:
-                downloader = MediaIoBaseDownload(fh, request)
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                    logging.info(f"Download de '{safe_file_name}': {int(status.progress() * 100)}% concluído.")
+            _stream_to_file(request, filepath, f"Download de '{safe_file_name}'", expected_size, settings, rate_limiter,
+                            progress_callback)
             return {'status': 'sucesso', 'filepath': filepath, 'attempts': attempt + 1, 'error': None}
         except Exception as e:
             error_message = str(e)
@@ -101,22 +336,20 @@ def download_file(service: Resource, file_id: str, safe_file_name: str, download
 
 
 def export_google_doc(service: Resource, file_id: str, safe_file_name: str, download_folder: str, 
-                      retries: int = DOWNLOAD_RETRIES, delay: int = DOWNLOAD_DELAY_SECONDS) -> Dict:
-    """Exporta um ficheiro Google Docs como PDF, com retentativas e suporte a caminhos longos."""
+                      retries: int = DOWNLOAD_RETRIES, delay: int = DOWNLOAD_DELAY_SECONDS,
+                      rate_limiter: Optional[RateLimiter] = None,
+                      write_settings: Optional[WriteSettings] = None,
+                      progress_callback: Optional[Callable[[int], None]] = None) -> Dict:
+    """Exporta um ficheiro Google Docs como PDF em streaming, com retentativas e suporte a caminhos longos."""
+    settings = write_settings or WriteSettings()
     for attempt in range(retries):
         try:
             request = service.files().export_media(fileId=file_id, mimeType='application/pdf')
             os.makedirs(download_folder, exist_ok=True)
             file_root, _ = os.path.splitext(safe_file_name)
             filepath = os.path.join(download_folder, f"{file_root}.pdf")
-            abs_filepath = os.path.abspath(filepath)
-            long_path_aware_filepath = f"\\\\?\\{abs_filepath}"
-            with open(long_path_aware_filepath, "wb") as fh:
-                downloader = MediaIoBaseDownload(fh, request)
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                    logging.info(f"Exportando '{safe_file_name}' para PDF: {int(status.progress() * 100)}% concluído.")
+            _stream_to_file(request, filepath, f"Exportando '{safe_file_name}' para PDF", None, settings, rate_limiter,
+                            progress_callback)
             return {'status': 'sucesso', 'filepath': filepath, 'attempts': attempt + 1, 'error': None}
         except Exception as e:
             error_message = str(e)
@@ -129,24 +362,26 @@ def export_google_doc(service: Resource, file_id: str, safe_file_name: str, down
     return {'status': 'falha', 'filepath': None, 'attempts': retries, 'error': 'Loop de tentativas finalizado inesperadamente.'}
 
 
-def get_drive_file_inventory(service: Resource, folder_id: str, parent_path: str = "") -> List[Dict]:
+def get_drive_file_inventory(service: Resource, folder_id: str, parent_path: str = "",
+                             rate_limiter: Optional[RateLimiter] = None) -> List[Dict]:
     """Gera um inventário completo de ficheiros com todas as informações necessárias."""
     inventory = []
     ignored_mime_types = ['application/vnd.google-apps.shortcut']
     try:
-        fields = "files(id, name, mimeType, md5Checksum)"
+        fields = "nextPageToken, files(id, name, mimeType, md5Checksum, size)"
         query = f"'{folder_id}' in parents and trashed = false"
         
         request = service.files().list(q=query, pageSize=1000, fields=fields, supportsAllDrives=True, includeItemsFromAllDrives=True)
         
         while request is not None:
+            _throttle(rate_limiter)
             results = request.execute()
             items = results.get('files', [])
             for item in items:
                 safe_name = _sanitize_path_component(item['name'])
                 current_path = os.path.join(parent_path, safe_name)
                 if item['mimeType'] == 'application/vnd.google-apps.folder':
-                    inventory.extend(get_drive_file_inventory(service, item['id'], current_path))
+                    inventory.extend(get_drive_file_inventory(service, item['id'], current_path, rate_limiter))
                 else:
                     task = {
                         'id': item['id'],
@@ -154,7 +389,8 @@ def get_drive_file_inventory(service: Resource, folder_id: str, parent_path: str
                         'safe_name': safe_name,
                         'relative_path': current_path.replace('\\', '/'),
                         'md5Checksum': item.get('md5Checksum'),
-                        'mimeType': item['mimeType']
+                        'mimeType': item['mimeType'],
+                        'size': int(item['size']) if item.get('size') else None
                     }
                     task['status'] = 'ignorado' if item['mimeType'] in ignored_mime_types else 'pendente'
                     inventory.append(task)
@@ -10,14 +10,133 @@ import datetime
 import json
 import csv
 import configparser
-from typing import List, Dict, Optional
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Dict, Optional, Tuple
 
 from drive_utils import (
-    setup_google_drive_service, 
+    RateLimiter,
+    DriveServicePool,
+    FsyncPolicy,
+    WriteSettings,
+    FSYNC_MODES,
+    DOWNLOAD_CHUNK_SIZE,
+    WRITE_BUFFER_SIZE,
+    check_free_disk_space,
+    partial_path_for,
     get_drive_file_inventory, 
     download_file, 
     export_google_doc
 )
+from googleapiclient.discovery import Resource
+
+# --- Download Scheduling Configuration ---
+ORDERING_POLICIES: List[str] = ['original', 'largest-first', 'smallest-first', 'folder']
+PROGRESS_LOG_INTERVAL_SECONDS: int = 30
+
+# --- Worker Scheduling Configuration ---
+STATE_SAVE_INTERVAL: int = 10
+SCHEDULING_QUANTUM_BYTES: int = 64 * 1024 * 1024
+UNSIZED_TASK_WEIGHT_BYTES: int = 1024 * 1024
+SCHEDULING_MAX_TASKS_PER_TURN: int = 16
+SCHEDULING_POLICIES: List[str] = ['round-robin', 'bytes']
+
+def get_task_size(task: Dict) -> int:
+    """Retorna o tamanho do item em bytes (0 quando desconhecido, p.ex. Google Docs)."""
+    return int(task.get('size') or 0)
+
+def order_tasks(tasks: List[Dict], policy: str) -> List[Dict]:
+    """Retorna as tarefas na ordem de download definida pela política.
+
+    - 'original': ordem em que o inventário do Drive foi gerado.
+    - 'largest-first': maiores primeiro, evitando que um ficheiro grande fique
+      sozinho no fim da execução quando há vários workers (`--workers`). Com um
+      único worker o tempo total não depende da ordem.
+    - 'smallest-first': menores primeiro, para concluir rapidamente a maioria dos itens.
+    - 'folder': agrupa os itens por pasta, favorecendo a localidade no disco.
+    """
+    if policy not in ORDERING_POLICIES:
+        raise ValueError(f"Política de ordenação desconhecida: '{policy}'.")
+    if policy in ['largest-first', 'smallest-first'] and any('size' not in t for t in tasks):
+        logging.warning("O ficheiro de estado não contém o tamanho dos itens. Apague-o para gerar um novo inventário com tamanhos.")
+    if policy == 'largest-first':
+        return sorted(tasks, key=get_task_size, reverse=True)
+    if policy == 'smallest-first':
+        return sorted(tasks, key=get_task_size)
+    if policy == 'folder':
+        return sorted(tasks, key=lambda t: (os.path.dirname(t['relative_path']), t['relative_path']))
+    return list(tasks)
+
+def _format_bytes(num_bytes: float) -> str:
+    """Formata um número de bytes numa unidade legível."""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+class ProgressTracker:
+    """Acompanha itens e bytes restantes e estima o tempo até ao fim pela vazão observada.
+
+    Os bytes são contados a cada bloco recebido (`add_transferred`), para que a
+    vazão e o ETA avancem também durante a transferência de ficheiros grandes;
+    o resumo é registado no log no máximo a cada `log_interval` segundos.
+    """
+
+    def __init__(self, tasks: List[Dict], log_interval: int = PROGRESS_LOG_INTERVAL_SECONDS) -> None:
+        self.total_items = len(tasks)
+        self.total_bytes = sum(get_task_size(t) for t in tasks)
+        self.done_items = 0
+        self.transferred_bytes = 0
+        self._completed_bytes = 0
+        self._in_flight: Dict[int, Tuple[int, int]] = {}
+        self._start_time = time.monotonic()
+        self._log_interval = log_interval
+        self._last_log_time = self._start_time
+        self._lock = threading.Lock()
+
+    @property
+    def remaining_bytes(self) -> int:
+        """Bytes planeados que ainda não foram recebidos."""
+        in_flight_bytes = sum(min(received, size) for received, size in self._in_flight.values())
+        return max(0, self.total_bytes - self._completed_bytes - in_flight_bytes)
+
+    def add_transferred(self, task: Dict, num_bytes: int) -> None:
+        """Regista um bloco recebido de uma tarefa em curso.
+
+        Um valor negativo desconta os bytes de uma tentativa falhada, que será
+        repetida do início. As tarefas são identificadas pelo próprio objeto,
+        pois o mesmo ID do Drive pode aparecer em mais de um cliente.
+        """
+        with self._lock:
+            self.transferred_bytes = max(0, self.transferred_bytes + num_bytes)
+            received, size = self._in_flight.get(id(task), (0, get_task_size(task)))
+            self._in_flight[id(task)] = (max(0, received + num_bytes), size)
+            now = time.monotonic()
+            should_log = num_bytes > 0 and now - self._last_log_time >= self._log_interval
+            if should_log:
+                self._last_log_time = now
+        if should_log:
+            logging.info(f"--- {self.summary()} ---")
+
+    def complete(self, task: Dict) -> None:
+        """Regista o fim de uma tarefa (com sucesso ou não)."""
+        with self._lock:
+            self.done_items += 1
+            self._in_flight.pop(id(task), None)
+            self._completed_bytes += get_task_size(task)
+
+    def summary(self) -> str:
+        """Texto de progresso com itens, bytes restantes, vazão e ETA."""
+        with self._lock:
+            remaining_bytes = self.remaining_bytes
+            elapsed = time.monotonic() - self._start_time
+            throughput = self.transferred_bytes / elapsed if elapsed > 0 else 0
+            eta = str(datetime.timedelta(seconds=int(remaining_bytes / throughput))) if throughput > 0 else '--:--:--'
+            return (f"[ {self.done_items} / {self.total_items} ] "
+                    f"{_format_bytes(remaining_bytes)} restantes, "
+                    f"{_format_bytes(throughput)}/s, ETA {eta}")
 
 def load_state(state_filepath: str) -> Optional[List[Dict]]:
     """Carrega o estado da extração de um ficheiro JSON."""
@@ -104,128 +223,381 @@ def create_backup(source_dir: str, backup_dir: str, client_name: str) -> bool:
         logging.error(f"Falha ao criar o backup: {e}")
         return False
 
-def main() -> None:
-    """Ponto de entrada principal para a execução do script de extração."""
-    config = configparser.ConfigParser()
-    config.read('config.ini')
-
+def load_path_settings(config: configparser.ConfigParser) -> Dict[str, str]:
+    """Resolve os diretórios de trabalho a partir do config.ini."""
     output_dir = config['Paths']['output_dir']
-    downloads_dir = os.path.join(output_dir, config['Paths']['downloads_dir_name'])
-    backups_dir = os.path.join(output_dir, config['Paths']['backups_dir_name'])
-    state_dir = os.path.join(output_dir, config['Paths']['state_dir_name'])
-    logs_dir = os.path.join(output_dir, config['Paths']['logs_dir_name'])
-    reports_dir = os.path.join(output_dir, config['Paths']['reports_dir_name'])
-    
-    os.makedirs(logs_dir, exist_ok=True)
-    os.makedirs(reports_dir, exist_ok=True)
+    return {
+        'downloads_dir': os.path.join(output_dir, config['Paths']['downloads_dir_name']),
+        'backups_dir': os.path.join(output_dir, config['Paths']['backups_dir_name']),
+        'state_dir': os.path.join(output_dir, config['Paths']['state_dir_name']),
+        'logs_dir': os.path.join(output_dir, config['Paths']['logs_dir_name']),
+        'reports_dir': os.path.join(output_dir, config['Paths']['reports_dir_name']),
+    }
 
-    log_filepath = os.path.join(logs_dir, config['Logging']['log_filename'])
-    
+def setup_logging(logs_dir: str, log_filename: str) -> None:
+    """Configura o logging para ficheiro e consola."""
+    os.makedirs(logs_dir, exist_ok=True)
+    log_filepath = os.path.join(logs_dir, log_filename)
     logging.basicConfig(level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s',
                         handlers=[
                             logging.FileHandler(log_filepath, encoding='utf-8'),
                             logging.StreamHandler()
                         ])
-    
-    parser = argparse.ArgumentParser(description="Fase 1: Ferramenta para extrair ficheiros do Google Drive.")
-    parser.add_argument('--drive-folder-id', required=True, help='ID da pasta raiz no Google Drive.')
-    parser.add_argument('--client-name', required=True, help='Nome do cliente para o backup e ficheiro de estado.')
-    parser.add_argument('--structure-only', action='store_true', help='Se presente, cria apenas a estrutura de pastas e encerra.')
-    args = parser.parse_args()
-    
-    state_filepath = os.path.join(state_dir, f"download_state_{args.client_name}.json")
-    
-    logging.info("--- INICIANDO FASE 1: EXTRAÇÃO E BACKUP ---")
-    
-    drive_service = setup_google_drive_service()
-    if not drive_service:
-        logging.critical("Falha na conexão com o Google Drive. Processo abortado.")
-        return
 
+def get_expected_path(task: Dict) -> str:
+    """Retorna o caminho relativo final do ficheiro (Google Docs são exportados como PDF)."""
+    expected_path = task['relative_path']
+    if 'google-apps' in task.get('mimeType', ''):
+        path_root, _ = os.path.splitext(expected_path)
+        expected_path = f"{path_root}.pdf"
+    return expected_path
+
+def plan_tasks(service: Resource, drive_folder_id: str, state_filepath: str,
+               rate_limiter: Optional[RateLimiter] = None) -> List[Dict]:
+    """Retoma o plano de download salvo ou mapeia o Drive para criar um novo."""
     tasks = load_state(state_filepath)
     if not tasks:
         logging.info("Iniciando fase de planeamento: mapeando todos os ficheiros no Drive...")
-        tasks = get_drive_file_inventory(drive_service, args.drive_folder_id)
+        tasks = get_drive_file_inventory(service, drive_folder_id, rate_limiter=rate_limiter)
         save_state(tasks, state_filepath)
         logging.info(f"Novo plano de download com {len(tasks)} itens foi criado.")
+    return tasks
 
+def create_folder_structure(tasks: List[Dict], downloads_dir: str) -> None:
+    """Cria localmente todas as pastas necessárias para o plano de download."""
     dir_paths_to_create = {os.path.dirname(task['relative_path']) for task in tasks if os.path.dirname(task['relative_path'])}
     for unique_dir in sorted(list(dir_paths_to_create)):
         full_dir_path = os.path.join(downloads_dir, unique_dir)
         os.makedirs(full_dir_path, exist_ok=True)
     logging.info("Estrutura de diretórios local criada/verificada com sucesso.")
-    
-    if args.structure_only:
-        logging.info("Modo --structure-only ativado. Encerrando o script.")
-        return
+    remove_stale_partial_files(tasks, downloads_dir)
 
-    logging.info("Iniciando/Retomando processo de download...")
-    total_tasks = len(tasks)
-    backlog_records = []
-    
-    for index, task in enumerate(tasks):
-        expected_path = task['relative_path']
-        if 'google-apps' in task.get('mimeType', ''):
-            path_root, _ = os.path.splitext(expected_path)
-            expected_path = f"{path_root}.pdf"
-        local_filepath = os.path.join(downloads_dir, expected_path)
-
-        if task['status'] in ['concluido', 'ignorado'] or (task['status'] == 'pendente' and os.path.exists(local_filepath)):
-            if task['status'] == 'pendente':
-                task['status'] = 'concluido'
-            logging.info(f"--- [ {index + 1} / {total_tasks} ] Pulando item: {task['safe_name']} (Status: {task['status']}) ---")
-            continue
-        
+def remove_stale_partial_files(tasks: List[Dict], downloads_dir: str) -> None:
+    """Apaga ficheiros .part deixados por uma execução interrompida (p.ex. SIGKILL ou falha de energia).
+
+    Só são removidos os .part que correspondem a itens do plano, para nunca apagar
+    ficheiros do Drive cujo nome termine legitimamente em '.part'.
+    """
+    removed = 0
+    for task in tasks:
+        partial_filepath = partial_path_for(os.path.join(downloads_dir, get_expected_path(task)))
+        if os.path.exists(partial_filepath):
+            try:
+                os.remove(partial_filepath)
+                removed += 1
+            except OSError as e:
+                logging.warning(f"Não foi possível remover o ficheiro parcial '{partial_filepath}': {e}")
+    if removed:
+        logging.info(f"{removed} ficheiro(s) parcial(is) de uma execução anterior removido(s).")
+
+def is_task_settled(task: Dict, downloads_dir: str) -> bool:
+    """Indica se a tarefa já não precisa de download, marcando como concluídas as já presentes em disco."""
+    local_filepath = os.path.join(downloads_dir, get_expected_path(task))
+    if task['status'] in ['concluido', 'ignorado'] or (task['status'] == 'pendente' and os.path.exists(local_filepath)):
         if task['status'] == 'pendente':
-            logging.info(f"--- [ {index + 1} / {total_tasks} ] Processando: {task['safe_name']} ---")
-            download_dir_path = os.path.join(downloads_dir, os.path.dirname(task['relative_path']))
-            
-            result: Dict
-            if 'google-apps' in task.get('mimeType', ''):
-                result = export_google_doc(drive_service, task['id'], task['safe_name'], download_folder=download_dir_path)
-            else:
-                result = download_file(drive_service, task['id'], task['safe_name'], download_folder=download_dir_path)
-            
-            task['status'] = result['status']
-            
-            record = {
-                'timestamp': datetime.datetime.now().isoformat(), 'status': result['status'].upper(),
-                'drive_id': task['id'], 'original_name': task.get('original_name', task['safe_name']),
-                'sanitized_name': task['safe_name'], 
-                'was_renamed': 'Sim' if task.get('original_name', task['safe_name']) != task['safe_name'] else 'Não',
-                'relative_path': task['relative_path'], 'attempts': result['attempts'],
-                'error_message': result['error'], 'md5_checksum': task.get('md5Checksum')
-            }
-            backlog_records.append(record)
-    
+            task['status'] = 'concluido'
+        return True
+    return False
+
+def get_pending_tasks(tasks: List[Dict], downloads_dir: str) -> List[Dict]:
+    """Retorna as tarefas que ainda precisam de download."""
+    return [t for t in tasks if not is_task_settled(t, downloads_dir) and t['status'] == 'pendente']
+
+def build_backlog_record(task: Dict, status: str, attempts: int, error_message: Optional[str]) -> Dict:
+    """Monta o registo de backlog CSV de uma tarefa processada."""
+    return {
+        'timestamp': datetime.datetime.now().isoformat(), 'status': status.upper(),
+        'drive_id': task['id'], 'original_name': task.get('original_name', task['safe_name']),
+        'sanitized_name': task['safe_name'], 
+        'was_renamed': 'Sim' if task.get('original_name', task['safe_name']) != task['safe_name'] else 'Não',
+        'relative_path': task['relative_path'], 'attempts': attempts,
+        'error_message': error_message, 'md5_checksum': task.get('md5Checksum')
+    }
+
+def process_task(service: Resource, task: Dict, downloads_dir: str,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 write_settings: Optional[WriteSettings] = None,
+                 progress: Optional[ProgressTracker] = None) -> Dict:
+    """Baixa (ou exporta) um item do plano, atualiza o seu status e retorna o registo de backlog."""
+    download_dir_path = os.path.join(downloads_dir, os.path.dirname(task['relative_path']))
+    progress_callback = (lambda num_bytes: progress.add_transferred(task, num_bytes)) if progress else None
+
+    result: Dict
+    if 'google-apps' in task.get('mimeType', ''):
+        result = export_google_doc(service, task['id'], task['safe_name'], download_folder=download_dir_path,
+                                   rate_limiter=rate_limiter, write_settings=write_settings,
+                                   progress_callback=progress_callback)
+    else:
+        result = download_file(service, task['id'], task['safe_name'], download_folder=download_dir_path,
+                               rate_limiter=rate_limiter, expected_size=task.get('size'),
+                               write_settings=write_settings, progress_callback=progress_callback)
+
+    task['status'] = result['status']
+    return build_backlog_record(task, result['status'], result['attempts'], result['error'])
+
+def check_disk_space_for_tasks(tasks: List[Dict], downloads_dir: str) -> bool:
+    """Verifica o espaço livre em disco contra o volume planeado das tarefas pendentes.
+
+    Ficheiros binários sem tamanho (estado gerado antes de o inventário registar
+    `size`) tornam a verificação inconclusiva e fazem-na falhar. As exportações
+    do Google Docs não têm tamanho prévio e são apenas reportadas.
+    """
+    unsized_files = [t for t in tasks if t.get('size') is None and 'google-apps' not in t.get('mimeType', '')]
+    if unsized_files:
+        logging.critical(f"{len(unsized_files)} ficheiro(s) pendente(s) sem tamanho conhecido no estado. "
+                         "Apague o ficheiro de estado para gerar um novo inventário ou use --skip-disk-check.")
+        return False
+    exported_docs = sum(1 for t in tasks if 'google-apps' in t.get('mimeType', ''))
+    if exported_docs:
+        logging.warning(f"{exported_docs} documento(s) Google serão exportados como PDF; "
+                        "o seu tamanho não entra na verificação de espaço em disco.")
+    return check_free_disk_space(downloads_dir, sum(get_task_size(t) for t in tasks))
+
+def positive_int(value: str) -> int:
+    """Tipo do argparse que aceita apenas inteiros maiores que zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' não é um número inteiro.")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"o valor deve ser maior que zero (recebido: {number}).")
+    return number
+
+def add_write_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adiciona as opções de escrita em disco partilhadas pelos scripts de extração."""
+    parser.add_argument('--chunk-size-mb', type=positive_int, default=DOWNLOAD_CHUNK_SIZE // (1024 * 1024),
+                        help='Tamanho de cada bloco transferido (e mantido em memória) por download.')
+    parser.add_argument('--buffer-size-kb', type=positive_int, default=WRITE_BUFFER_SIZE // 1024,
+                        help='Tamanho do buffer de escrita em disco por ficheiro.')
+    parser.add_argument('--no-preallocate', action='store_true', help='Não pré-aloca o espaço dos ficheiros de tamanho conhecido.')
+    parser.add_argument('--fsync', choices=FSYNC_MODES, default='final', help='Quando sincronizar os ficheiros com o disco.')
+    parser.add_argument('--fsync-every', type=positive_int, default=100, help="Número de ficheiros por sincronização no modo 'lote'.")
+    parser.add_argument('--skip-disk-check', action='store_true', help='Não verifica o espaço livre em disco antes dos downloads.')
+
+def build_write_settings(args: argparse.Namespace) -> WriteSettings:
+    """Cria as definições de escrita a partir dos argumentos da linha de comandos."""
+    return WriteSettings(chunk_size=args.chunk_size_mb * 1024 * 1024,
+                         buffer_size=args.buffer_size_kb * 1024,
+                         preallocate=not args.no_preallocate,
+                         fsync_policy=FsyncPolicy(args.fsync, args.fsync_every))
+
+def finalize_extraction(tasks: List[Dict], backlog_records: List[Dict], client_name: str, state_filepath: str,
+                        downloads_dir: str, backups_dir: str, reports_dir: str) -> bool:
+    """Salva o estado, escreve o backlog, verifica os downloads e cria o backup do cliente."""
     save_state(tasks, state_filepath)
     
     logging.info("Processo de download finalizado. Iniciando relatórios e verificação...")
     
-    write_backlog_csv(backlog_records, args.client_name, reports_dir)
-    
-    final_tasks = tasks
-    drive_inventory_paths = []
-    for t in final_tasks:
-        if t['status'] in ['ignorado', 'falha']:
-            continue
-        path = t['relative_path']
-        if 'google-apps' in t.get('mimeType', ''):
-            path_root, _ = os.path.splitext(path)
-            drive_inventory_paths.append(f"{path_root}.pdf")
-        else:
-            drive_inventory_paths.append(path)
+    write_backlog_csv(backlog_records, client_name, reports_dir)
     
+    drive_inventory_paths = [get_expected_path(t) for t in tasks if t['status'] not in ['ignorado', 'falha']]
     local_inventory_paths = get_local_file_inventory(downloads_dir)
     is_download_complete = verify_downloads(drive_inventory_paths, local_inventory_paths)
     
     if is_download_complete:
-        create_backup(downloads_dir, backups_dir, args.client_name)
-        logging.info("--- FASE 1 CONCLUÍDA COM SUCESSO ---")
+        create_backup(downloads_dir, backups_dir, client_name)
     else:
         logging.error("O backup foi ignorado devido a ficheiros faltantes na extração.")
+    return is_download_complete
+
+def _task_weight(task: Dict, unsized_weight: int = UNSIZED_TASK_WEIGHT_BYTES) -> int:
+    """Peso da tarefa em bytes para o escalonamento.
+
+    Itens sem tamanho (exportações do Google Docs, estados antigos) recebem um
+    peso nominal, pois cada um é uma transferência real.
+    """
+    if task.get('size') is None:
+        return unsized_weight
+    return max(1, int(task['size']))
+
+class ClientJob:
+    """Estado de execução da extração de um cliente."""
+
+    def __init__(self, client_name: str, drive_folder_id: str, downloads_dir: str, state_filepath: str) -> None:
+        self.client_name = client_name
+        self.drive_folder_id = drive_folder_id
+        self.downloads_dir = downloads_dir
+        self.state_filepath = state_filepath
+        self.tasks: List[Dict] = []
+        self.pending: Deque[Dict] = deque()
+        self.unsized_weight = UNSIZED_TASK_WEIGHT_BYTES
+        self.backlog_records: List[Dict] = []
+        self.planning_error: Optional[str] = None
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+    def load_pending(self, order: str = 'original') -> None:
+        """Separa as tarefas que ainda precisam de download, na ordem definida pela política."""
+        self.pending = deque(order_tasks(get_pending_tasks(self.tasks, self.downloads_dir), order))
+        known_sizes = [int(t['size']) for t in self.pending if t.get('size') is not None]
+        if known_sizes:
+            self.unsized_weight = max(1, sum(known_sizes) // len(known_sizes))
+
+    def next_weight(self) -> int:
+        """Peso da próxima tarefa pendente (itens sem tamanho valem o tamanho médio conhecido do cliente)."""
+        return _task_weight(self.pending[0], self.unsized_weight)
+
+    def record(self, record: Dict) -> None:
+        """Regista o resultado de uma tarefa e salva o estado periodicamente."""
+        with self._lock:
+            self.backlog_records.append(record)
+            self._unsaved += 1
+            if self._unsaved >= STATE_SAVE_INTERVAL:
+                save_state(self.tasks, self.state_filepath)
+                self._unsaved = 0
+
+class FairScheduler:
+    """Distribui as tarefas pendentes entre os clientes de forma justa.
+
+    - 'round-robin': alterna entre os clientes, uma tarefa de cada vez.
+    - 'bytes': deficit round-robin por bytes. Em cada vez, o cliente recebe um
+      crédito de `quantum` bytes e despacha tarefas enquanto o crédito cobrir o
+      tamanho da próxima. Todos os clientes recebem a mesma fatia de bytes, de
+      modo que um cliente pequeno termina cedo em vez de esperar pelo maior.
+      Itens sem tamanho pesam o tamanho médio conhecido do cliente (ou 1 MB),
+      e cada vez despacha no máximo `max_tasks_per_turn` tarefas.
+    """
+
+    def __init__(self, jobs: List[ClientJob], policy: str = 'round-robin',
+                 quantum: int = SCHEDULING_QUANTUM_BYTES,
+                 max_tasks_per_turn: int = SCHEDULING_MAX_TASKS_PER_TURN) -> None:
+        if policy not in SCHEDULING_POLICIES:
+            raise ValueError(f"Política de escalonamento desconhecida: '{policy}'.")
+        self.jobs = jobs
+        self.policy = policy
+        self._next_index = 0
+        self.quantum = max(1, quantum)
+        self.max_tasks_per_turn = max(1, max_tasks_per_turn)
+        self._turn_tasks = 0
+        self._deficit = {job.client_name: 0 for job in jobs}
+        if jobs and jobs[0].pending:
+            self._deficit[jobs[0].client_name] = self.quantum
+        self._lock = threading.Lock()
+
+    def _pick_round_robin(self, active: List[ClientJob]) -> ClientJob:
+        for offset in range(len(self.jobs)):
+            job = self.jobs[(self._next_index + offset) % len(self.jobs)]
+            if job in active:
+                self._next_index = (self._next_index + offset + 1) % len(self.jobs)
+                return job
+        return active[0]
+
+    def _pick_deficit(self) -> ClientJob:
+        while True:
+            job = self.jobs[self._next_index]
+            if (job.pending and self._turn_tasks < self.max_tasks_per_turn
+                    and self._deficit[job.client_name] >= job.next_weight()):
+                self._deficit[job.client_name] -= job.next_weight()
+                self._turn_tasks += 1
+                return job
+            if not job.pending:
+                self._deficit[job.client_name] = 0
+            self._turn_tasks = 0
+            self._next_index = (self._next_index + 1) % len(self.jobs)
+            next_job = self.jobs[self._next_index]
+            if next_job.pending:
+                self._deficit[next_job.client_name] += self.quantum
+
+    def next_task(self) -> Optional[Tuple[ClientJob, Dict]]:
+        """Retorna o próximo par (cliente, tarefa), ou None quando não houver mais trabalho."""
+        with self._lock:
+            active = [job for job in self.jobs if job.pending]
+            if not active:
+                return None
+            job = self._pick_deficit() if self.policy == 'bytes' else self._pick_round_robin(active)
+            return job, job.pending.popleft()
+
+def _download_worker(scheduler: FairScheduler, pool: DriveServicePool, rate_limiter: Optional[RateLimiter],
+                     progress: ProgressTracker, write_settings: WriteSettings) -> None:
+    """Consome tarefas do escalonador até não haver mais trabalho."""
+    while True:
+        next_item = scheduler.next_task()
+        if next_item is None:
+            return
+        job, task = next_item
+        logging.info(f"--- {progress.summary()} [{job.client_name}] Processando: {task['safe_name']} ---")
+        try:
+            with pool.acquire() as service:
+                record = process_task(service, task, job.downloads_dir, rate_limiter, write_settings, progress)
+        except Exception as e:
+            logging.error(f"[{job.client_name}] Erro inesperado ao processar '{task['safe_name']}': {e}")
+            task['status'] = 'falha'
+            record = build_backlog_record(task, 'falha', 0, str(e))
+        progress.complete(task)
+        job.record(record)
+
+def run_download_workers(scheduler: FairScheduler, pool: DriveServicePool, rate_limiter: Optional[RateLimiter],
+                         progress: ProgressTracker, write_settings: WriteSettings, workers: int) -> None:
+    """Executa `workers` threads de download até o escalonador esgotar as tarefas."""
+    threads = [threading.Thread(target=_download_worker,
+                                args=(scheduler, pool, rate_limiter, progress, write_settings), daemon=True)
+               for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    write_settings.fsync_policy.flush()
+
+def main() -> None:
+    """Ponto de entrada principal para a execução do script de extração."""
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+
+    paths = load_path_settings(config)
+    downloads_dir = paths['downloads_dir']
+    os.makedirs(paths['reports_dir'], exist_ok=True)
+    setup_logging(paths['logs_dir'], config['Logging']['log_filename'])
+    
+    parser = argparse.ArgumentParser(description="Fase 1: Ferramenta para extrair ficheiros do Google Drive.")
+    parser.add_argument('--drive-folder-id', required=True, help='ID da pasta raiz no Google Drive.')
+    parser.add_argument('--client-name', required=True, help='Nome do cliente para o backup e ficheiro de estado.')
+    parser.add_argument('--structure-only', action='store_true', help='Se presente, cria apenas a estrutura de pastas e encerra.')
+    parser.add_argument('--order', choices=ORDERING_POLICIES, default='original', help='Ordem de download dos ficheiros.')
+    parser.add_argument('--workers', type=positive_int, default=1,
+                        help="Número de downloads simultâneos; com mais de um, '--order largest-first' encurta a cauda final.")
+    add_write_arguments(parser)
+    args = parser.parse_args()
+    write_settings = build_write_settings(args)
+    
+    state_filepath = os.path.join(paths['state_dir'], f"download_state_{args.client_name}.json")
+    
+    logging.info("--- INICIANDO FASE 1: EXTRAÇÃO E BACKUP ---")
+    
+    try:
+        pool = DriveServicePool(args.workers)
+    except Exception as e:
+        logging.critical(f"Falha na conexão com o Google Drive. Processo abortado: {e}")
+        return
+
+    job = ClientJob(args.client_name, args.drive_folder_id, downloads_dir, state_filepath)
+    with pool.acquire() as drive_service:
+        job.tasks = plan_tasks(drive_service, args.drive_folder_id, state_filepath)
+    create_folder_structure(job.tasks, downloads_dir)
+    
+    if args.structure_only:
+        logging.info("Modo --structure-only ativado. Encerrando o script.")
+        return
+
+    logging.info(f"Iniciando/Retomando processo de download com {args.workers} worker(s)...")
+    job.load_pending(args.order)
+    logging.info(f"{len(job.tasks) - len(job.pending)} itens já concluídos ou ignorados; {len(job.pending)} pendentes.")
+    progress = ProgressTracker(list(job.pending))
+    
+    if not args.skip_disk_check and not check_disk_space_for_tasks(list(job.pending), downloads_dir):
+        logging.critical("Verificação de espaço em disco falhou. Processo abortado antes dos downloads.")
+        return
+    
+    run_download_workers(FairScheduler([job]), pool, None, progress, write_settings, args.workers)
+    logging.info(f"--- {progress.summary()} ---")
+    
+    is_download_complete = finalize_extraction(job.tasks, job.backlog_records, args.client_name, state_filepath,
+                                               downloads_dir, paths['backups_dir'], paths['reports_dir'])
+    
+    if is_download_complete:
+        logging.info("--- FASE 1 CONCLUÍDA COM SUCESSO ---")
+    else:
         logging.info("--- FASE 1 CONCLUÍDA COM ERROS ---")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,179 @@
+# extrator_lote.py
+
+"""Script orquestrador da Fase 1 em lote: vários clientes num único processo.
+
+Lê um manifesto JSON com a lista de clientes e executa as suas extrações em
+paralelo, partilhando um pool limitado de clientes do Drive e um único
+orçamento de pedidos à API. Um escalonador justo alterna entre os clientes
+para que um cliente muito grande não monopolize os workers. Estado, backlog
+CSV e backup continuam separados por cliente.
+
+Cada cliente usa a sua própria subpasta: os ficheiros vão para
+`<downloads_dir>/<client_name>/` e o estado para
+`<state_dir>/lote/download_state_<client_name>.json`. O estado do modo de
+cliente único (extrator_drive.py) refere-se à raiz de `downloads_dir` e por
+isso não é reaproveitado: um cliente movido para o manifesto é replaneado.
+
+Exemplo de manifesto:
+
+    [
+        {"client_name": "cliente_a", "drive_folder_id": "1AbC..."},
+        {"client_name": "cliente_b", "drive_folder_id": "1XyZ..."}
+    ]
+"""
+
+import argparse
+import logging
+import os
+import json
+import configparser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict
+
+from drive_utils import (
+    RateLimiter,
+    DriveServicePool,
+    API_REQUESTS_PER_SECOND,
+    API_BURST_SIZE
+)
+from extrator_drive import (
+    ClientJob,
+    FairScheduler,
+    ProgressTracker,
+    load_path_settings,
+    setup_logging,
+    plan_tasks,
+    create_folder_structure,
+    positive_int,
+    finalize_extraction,
+    add_write_arguments,
+    build_write_settings,
+    check_disk_space_for_tasks,
+    run_download_workers,
+    ORDERING_POLICIES,
+    SCHEDULING_POLICIES
+)
+
+# --- Batch Configuration ---
+DEFAULT_POOL_SIZE: int = 4
+BATCH_STATE_SUBDIR: str = 'lote'
+
+
+def load_manifest(manifest_filepath: str) -> List[Dict]:
+    """Lê e valida o manifesto JSON de clientes."""
+    with open(manifest_filepath, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError("O manifesto deve ser uma lista de clientes.")
+    seen_names = set()
+    for entry in entries:
+        if not entry.get('client_name') or not entry.get('drive_folder_id'):
+            raise ValueError(f"Entrada de manifesto inválida (client_name e drive_folder_id são obrigatórios): {entry}")
+        if entry['client_name'] in seen_names:
+            raise ValueError(f"Cliente duplicado no manifesto: '{entry['client_name']}'.")
+        seen_names.add(entry['client_name'])
+    return entries
+
+
+def _plan_job(job: ClientJob, pool: DriveServicePool, rate_limiter: RateLimiter, order: str) -> None:
+    """Carrega ou cria o plano de download de um cliente usando um cliente do pool.
+
+    Uma falha aqui afeta apenas este cliente: fica sem tarefas pendentes e é
+    reportado como falhado no fim, enquanto os restantes seguem normalmente.
+    """
+    try:
+        with pool.acquire() as service:
+            job.tasks = plan_tasks(service, job.drive_folder_id, job.state_filepath, rate_limiter)
+        create_folder_structure(job.tasks, job.downloads_dir)
+        job.load_pending(order)
+    except Exception as e:
+        logging.error(f"[{job.client_name}] Falha no planeamento; cliente ignorado nesta execução: {e}")
+        job.planning_error = str(e)
+        job.pending = deque()
+        return
+    logging.info(f"[{job.client_name}] {len(job.pending)} de {len(job.tasks)} itens pendentes.")
+
+
+def main() -> None:
+    """Ponto de entrada principal para a extração em lote."""
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+
+    paths = load_path_settings(config)
+    os.makedirs(paths['reports_dir'], exist_ok=True)
+    setup_logging(paths['logs_dir'], config['Logging']['log_filename'])
+
+    parser = argparse.ArgumentParser(description="Fase 1 em lote: extrai vários clientes do Google Drive num único processo.")
+    parser.add_argument('--manifest', required=True, help='Ficheiro JSON com a lista de clientes (client_name, drive_folder_id).')
+    parser.add_argument('--pool-size', type=positive_int, default=DEFAULT_POOL_SIZE, help='Número máximo de clientes do Drive partilhados.')
+    parser.add_argument('--workers', type=positive_int, default=None, help='Número de downloads simultâneos (padrão: tamanho do pool).')
+    parser.add_argument('--scheduling', choices=SCHEDULING_POLICIES, default='round-robin', help='Política de escalonamento entre clientes.')
+    parser.add_argument('--order', choices=ORDERING_POLICIES, default='original', help='Ordem de download dos ficheiros dentro de cada cliente.')
+    parser.add_argument('--requests-per-second', type=float, default=API_REQUESTS_PER_SECOND, help='Orçamento global de pedidos à API.')
+    parser.add_argument('--structure-only', action='store_true', help='Se presente, cria apenas a estrutura de pastas e encerra.')
+    add_write_arguments(parser)
+    args = parser.parse_args()
+    write_settings = build_write_settings(args)
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (IOError, ValueError) as e:
+        logging.critical(f"Não foi possível carregar o manifesto '{args.manifest}': {e}")
+        return
+
+    logging.info(f"--- INICIANDO FASE 1 EM LOTE: {len(manifest)} CLIENTE(S) ---")
+
+    try:
+        pool = DriveServicePool(args.pool_size)
+    except Exception as e:
+        logging.critical(f"Falha na conexão com o Google Drive. Processo abortado: {e}")
+        return
+    rate_limiter = RateLimiter(args.requests_per_second, API_BURST_SIZE)
+    workers = args.workers or args.pool_size
+
+    jobs = [
+        ClientJob(entry['client_name'], entry['drive_folder_id'],
+                  downloads_dir=os.path.join(paths['downloads_dir'], entry['client_name']),
+                  state_filepath=os.path.join(paths['state_dir'], BATCH_STATE_SUBDIR,
+                                              f"download_state_{entry['client_name']}.json"))
+        for entry in manifest
+    ]
+
+    logging.info("Iniciando fase de planeamento de todos os clientes...")
+    with ThreadPoolExecutor(max_workers=args.pool_size) as executor:
+        list(executor.map(lambda job: _plan_job(job, pool, rate_limiter, args.order), jobs))
+
+    if args.structure_only:
+        logging.info("Modo --structure-only ativado. Encerrando o script.")
+        return
+
+    logging.info(f"Iniciando/Retomando downloads com {workers} worker(s) (escalonamento: {args.scheduling})...")
+    scheduler = FairScheduler(jobs, args.scheduling)
+    all_pending = [task for job in jobs for task in job.pending]
+    progress = ProgressTracker(all_pending)
+    if not args.skip_disk_check and not check_disk_space_for_tasks(all_pending, paths['downloads_dir']):
+        logging.critical("Verificação de espaço em disco falhou. Processo abortado antes dos downloads.")
+        return
+
+    run_download_workers(scheduler, pool, rate_limiter, progress, write_settings, workers)
+    logging.info(f"--- {progress.summary()} ---")
+
+    failed_clients = []
+    for job in jobs:
+        if job.planning_error is not None:
+            failed_clients.append(job.client_name)
+            continue
+        logging.info(f"--- [{job.client_name}] Finalizando extração ---")
+        if not finalize_extraction(job.tasks, job.backlog_records, job.client_name, job.state_filepath,
+                                   job.downloads_dir, paths['backups_dir'], paths['reports_dir']):
+            failed_clients.append(job.client_name)
+
+    if not failed_clients:
+        logging.info("--- FASE 1 EM LOTE CONCLUÍDA COM SUCESSO ---")
+    else:
+        logging.error(f"Clientes com erros: {', '.join(failed_clients)}")
+        logging.info("--- FASE 1 EM LOTE CONCLUÍDA COM ERROS ---")
+
+if __name__ == "__main__":
+    main()